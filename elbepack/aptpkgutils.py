@@ -63,6 +63,7 @@ def getdeps(pkg):
 
 def getalldeps(c, pkgname):
     retval = []
+    seen = set()
     togo = [pkgname]
 
     while togo:
@@ -70,10 +71,11 @@ def getalldeps(c, pkgname):
         pkg = c[pp]
 
         for p in getdeps(pkg.candidate):
-            if p in retval:
+            if p in seen:
                 continue
             if p not in c:
                 continue
+            seen.add(p)
             retval.append(p)
             togo.append(p)
 
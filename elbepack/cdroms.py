@@ -6,12 +6,12 @@ import logging
 import os
 import pathlib
 import subprocess
-from shutil import copyfile
 
 from apt.package import FetchError
 
 from elbepack.aptpkgutils import XMLPackage
 from elbepack.archivedir import archive_tmpfile
+from elbepack.filesystem import link_or_copy
 from elbepack.isooptions import get_iso_options
 from elbepack.repomanager import CdromBinRepo, CdromInitRepo, CdromSrcRepo
 from elbepack.rpcaptcache import get_rpcaptcache
@@ -114,9 +114,8 @@ def mk_source_cdrom(components, codename,
                 for volume_number in volume_list:
                     with archive_tmpfile(arch_vol.text('.')) as fp:
                         if volume_number in repo.volume_indexes:
-                            do(
-                                f'tar xvfj "{fp.name}" -h -C '
-                                f'"{repo.get_volume_path(volume_number)}"')
+                            do(['tar', 'xvfj', fp.name, '-h', '-C',
+                                repo.get_volume_path(volume_number)])
                         else:
                             logging.warning("The src-cdrom archive's volume value "
                                             'is not contained in the actual volumes')
@@ -144,7 +143,7 @@ def mk_binary_cdrom(rfs, arch, codename, init_codename, xml, target):
     # just copy it. the repo __init__() afterwards will
     # not touch the repo config, nor generate a new key.
     try:
-        do(f'cp -av /var/cache/elbe/initvm-bin-repo "{repo_path}"')
+        do(['cp', '-av', '/var/cache/elbe/initvm-bin-repo', repo_path])
     except subprocess.CalledProcessError:
         # When /var/cache/elbe/initvm-bin-repo has not been created
         # (because the initvm install was an old version or somthing,
@@ -154,7 +153,7 @@ def mk_binary_cdrom(rfs, arch, codename, init_codename, xml, target):
                           'This happened because the initvm was probably\n'
                           'generated with --skip-build-bin')
 
-        do(f'mkdir -p "{repo_path}"')
+        do(['mkdir', '-p', repo_path])
 
     repo = CdromInitRepo(init_codename, repo_path, mirror)
 
@@ -214,10 +213,10 @@ def mk_binary_cdrom(rfs, arch, codename, init_codename, xml, target):
     xml.xml.write(repo_path / 'source.xml')
 
     # copy initvm-cdrom.gz and vmlinuz
-    copyfile('/var/cache/elbe/installer/initrd-cdrom.gz',
-             repo_path / 'initrd-cdrom.gz')
-    copyfile('/var/cache/elbe/installer/vmlinuz',
-             repo_path / 'vmlinuz')
+    link_or_copy('/var/cache/elbe/installer/initrd-cdrom.gz',
+                 repo_path / 'initrd-cdrom.gz')
+    link_or_copy('/var/cache/elbe/installer/vmlinuz',
+                 repo_path / 'vmlinuz')
 
     target_repo_path.joinpath('.aptignr').touch()
 
@@ -8,14 +8,13 @@ import shutil
 import subprocess
 import sys
 import tempfile
-from shutil import copyfile
 from urllib.request import urlopen
 
 from gpg import core
 from gpg.constants import PROTOCOL_OpenPGP
 
 from elbepack.egpg import OverallStatus, check_signature, unarmor_openpgp_keyring
-from elbepack.filesystem import TmpdirFilesystem
+from elbepack.filesystem import TmpdirFilesystem, link_or_copy
 from elbepack.hashes import HashValidationFailed, HashValidator
 from elbepack.treeutils import strip_leading_whitespace_from_lines
 
@@ -226,21 +225,21 @@ def copy_kinitrd(prj, target_dir):
             ], check=True)
 
             # initrd.gz needs to be cdrom version !
-            copyfile(tmp.fname('initrd-cdrom.gz'),
-                     os.path.join(target_dir, 'initrd.gz'))
+            link_or_copy(tmp.fname('initrd-cdrom.gz'),
+                         os.path.join(target_dir, 'initrd.gz'))
         else:
             mirror = get_primary_mirror(prj)
             primary_key = get_primary_key(prj)
             download_kinitrd(tmp, suite, mirror, primary_key, prj.has('noauth'))
 
-            copyfile(tmp.fname('initrd.gz'),
-                     os.path.join(target_dir, 'initrd.gz'))
+            link_or_copy(tmp.fname('initrd.gz'),
+                         os.path.join(target_dir, 'initrd.gz'))
 
-        copyfile(tmp.fname('initrd-cdrom.gz'),
-                 os.path.join(target_dir, 'initrd-cdrom.gz'))
+        link_or_copy(tmp.fname('initrd-cdrom.gz'),
+                     os.path.join(target_dir, 'initrd-cdrom.gz'))
 
-        copyfile(tmp.fname('vmlinuz'),
-                 os.path.join(target_dir, 'vmlinuz'))
+        link_or_copy(tmp.fname('vmlinuz'),
+                     os.path.join(target_dir, 'vmlinuz'))
 
     except IOError as e:
         raise NoKinitrdException(f'IoError {e}')
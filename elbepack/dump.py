@@ -4,13 +4,13 @@
 
 import collections
 import pathlib
+from base64 import standard_b64decode
 from datetime import datetime
 from fnmatch import fnmatchcase
 
 from apt import Cache
 
 from elbepack.aptpkgutils import APTPackage, XMLPackage
-from elbepack.archivedir import archive_tmpfile
 from elbepack.finetuning import do_finetuning
 from elbepack.log import report, validation
 from elbepack.shellhelper import do
@@ -167,6 +167,9 @@ def elbe_report(xml, buildenv, cache, targetfs):
 
     rfs = buildenv.rfs
 
+    archive = xml.text('archive') if xml.has('archive') else None
+    pkgversionlist = xml.has('target/pkgversionlist')
+
     report.info('ELBE Report for Project %s\n\n'
                 'Report timestamp: %s\n'
                 'elbe: %s',
@@ -216,9 +219,9 @@ def elbe_report(xml, buildenv, cache, targetfs):
     index = cache.get_fileindex(removeprefix='/usr')
     mt_index = targetfs.mtime_snap()
 
-    if xml.has('archive') and not xml.text('archive') is None:
-        with archive_tmpfile(xml.text('archive')) as fp:
-            do(f'tar xvfj "{fp.name}" -h -C "{targetfs.path}"')
+    if archive is not None:
+        do(['tar', 'xvfj', '-', '-h', '-C', targetfs.path],
+           input=standard_b64decode(archive))
         mt_index_postarch = targetfs.mtime_snap()
     else:
         mt_index_postarch = mt_index
@@ -236,7 +239,9 @@ def elbe_report(xml, buildenv, cache, targetfs):
 
     tgt_pkg_list = set()
 
-    for fpath, _ in targetfs.walk_files():
+    # mt_index_post_fine is a snapshot of the final target, so iterate over
+    # it instead of walking the tree once more.
+    for fpath in mt_index_post_fine:
         unprefixed = fpath[len('/usr'):] if fpath.startswith('/usr') else fpath
         if unprefixed in index:
             pkg = index[unprefixed]
@@ -244,19 +249,17 @@ def elbe_report(xml, buildenv, cache, targetfs):
         else:
             pkg = 'postinst generated'
 
-        if fpath in mt_index_post_fine:
-            if fpath in mt_index_postarch:
-                if mt_index_post_fine[fpath] != mt_index_postarch[fpath]:
-                    pkg = 'modified finetuning'
-                elif fpath in mt_index:
-                    if mt_index_postarch[fpath] != mt_index[fpath]:
-                        pkg = 'from archive'
-                    # else leave pkg as is
-                else:
-                    pkg = 'added in archive'
+        if fpath in mt_index_postarch:
+            if mt_index_post_fine[fpath] != mt_index_postarch[fpath]:
+                pkg = 'modified finetuning'
+            elif fpath in mt_index:
+                if mt_index_postarch[fpath] != mt_index[fpath]:
+                    pkg = 'from archive'
+                # else leave pkg as is
             else:
-                pkg = 'added in finetuning'
-        # else leave pkg as is
+                pkg = 'added in archive'
+        else:
+            pkg = 'added in finetuning'
 
         report.info('|+%s+|%s', fpath, pkg)
 
@@ -284,7 +287,7 @@ def elbe_report(xml, buildenv, cache, targetfs):
     for p in instpkgs:
         pkgindex[p.name] = p
 
-    if xml.has('target/pkgversionlist'):
+    if pkgversionlist:
         targetfs.remove('etc/elbe_pkglist')
         f = targetfs.open('etc/elbe_pkglist', 'w')
     for pkg in tgt_pkg_list:
@@ -295,13 +298,13 @@ def elbe_report(xml, buildenv, cache, targetfs):
                     p.installed_version,
                     p.is_auto_installed,
                     hashes)
-        if xml.has('target/pkgversionlist'):
+        if pkgversionlist:
             f.write(f'{p.name} {p.installed_version} {hashes}\n')
 
-    if xml.has('target/pkgversionlist'):
+    if pkgversionlist:
         f.close()
 
-    if not xml.has('archive') or xml.text('archive') is None:
+    if archive is None:
         return list(tgt_pkg_list)
 
     validation.info('')
@@ -2,23 +2,28 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 # SPDX-FileCopyrightText: 2015-2018 Linutronix GmbH
 
+import collections
 import contextlib
 import filecmp
+import functools
 import io
 import logging
 import os
 import pathlib
+import shlex
 import shutil
 import subprocess
 import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 from elbepack.filesystem import Filesystem
 from elbepack.fstab import fstabentry
 from elbepack.imgutils import mount
 from elbepack.licencexml import copyright_xml
+from elbepack.log import async_logging_ctx, grow_pipe
 from elbepack.packers import default_packer
-from elbepack.shellhelper import chroot, do
+from elbepack.shellhelper import ELBE_LOGGING, chroot, do, run
 from elbepack.version import elbe_version
 
 
@@ -96,6 +101,10 @@ def dpkg_architecture():
     ).rstrip('\n')
 
 
+# Pseudo filesystem mount points, these are created empty in the target
+_EXTRACT_SKIP = frozenset(['proc', 'sys'])
+
+
 def _readlines(rfs, file):
     try:
         with rfs.open(file) as f:
@@ -104,6 +113,28 @@ def _readlines(rfs, file):
         return []
 
 
+_DPKG_INFO = 'var/lib/dpkg/info'
+_DPKG_INFO_FILELISTS = ('.list', '.conffiles')
+
+
+def _dpkg_info_files(rfs, arch):
+    # Scan var/lib/dpkg/info once and map each package to the paths of its
+    # .list and .conffiles, both the plain and the arch-qualified ones.
+    # Files of the build architecture are also found under the plain
+    # package name, as the package list may name them either way.
+    info = collections.defaultdict(list)
+    archsuffix = f':{arch}'
+    for fname in os.listdir(rfs.fname(_DPKG_INFO)):
+        if not fname.endswith(_DPKG_INFO_FILELISTS):
+            continue
+        pkg = fname.rpartition('.')[0]
+        path = f'{_DPKG_INFO}/{fname}'
+        info[pkg].append(path)
+        if pkg.endswith(archsuffix):
+            info[pkg[:-len(archsuffix)]].append(path)
+    return info
+
+
 def extract_target(src, xml, dst, cache):
 
     # create filelists describing the content of the target rfs
@@ -112,29 +143,38 @@ def extract_target(src, xml, dst, cache):
         arch = xml.text('project/buildimage/arch', key='arch')
 
         if xml.tgt.has('diet'):
-            withdeps = []
+            deps = set()
             for p in pkglist:
-                deps = cache.get_dependencies(p)
-                withdeps += [d.name for d in deps]
-                withdeps += [p]
+                # The dependencies of a package that already got pulled in
+                # are part of the closure we have, skip the cache lookup.
+                if p in deps:
+                    continue
+                deps.update(d.name for d in cache.get_dependencies(p))
 
-            pkglist = list(set(withdeps))
+            pkglist = sorted(deps.union(pkglist))
 
-        file_list = []
-        for line in pkglist:
-            file_list += _readlines(src, f'var/lib/dpkg/info/{line}.list')
-            file_list += _readlines(src, f'var/lib/dpkg/info/{line}.conffiles')
+        info = _dpkg_info_files(src, arch)
 
-            file_list += _readlines(src, f'var/lib/dpkg/info/{line}:{arch}.list')
-            file_list += _readlines(src, f'var/lib/dpkg/info/{line}:{arch}.conffiles')
+        manifests = [path for pkg in pkglist for path in info.get(pkg, ())]
+
+        file_list = []
+        for lines in _read_parallel(functools.partial(_readlines, src), manifests):
+            file_list += lines
 
         file_list = sorted(set(file_list),
                            key=lambda k: k[4:] if k.startswith('/usr') else k)
         copy_filelist(src, file_list, dst)
     else:
         # first copy most diretories
-        for f in src.listdir():
-            subprocess.call(['cp', '-a', '--reflink=auto', f, dst.fname('')])
+        subprocess.call(['cp', '-a', '--reflink=auto',
+                         *src.listdir(ignore=_EXTRACT_SKIP), dst.fname('')])
+        # the skipped mount points keep their owner and mode, e.g. 0555
+        for d in _EXTRACT_SKIP:
+            if src.isdir(d) and not src.islink(d):
+                dst.mkdir_p(d)
+                st = src.stat(d)
+                dst.chown(d, st.st_uid, st.st_gid)
+                shutil.copystat(src.fname(d), dst.fname(d))
 
     try:
         dst.mkdir_p('dev')
@@ -162,27 +202,23 @@ def extract_target(src, xml, dst, cache):
             ui = '/usr/share/elbe/qemu-elbe/' + str(xml.defs['userinterpr'])
             if not os.path.exists(ui):
                 ui = '/usr/bin/' + str(xml.defs['userinterpr'])
-            do(f"cp {ui} {dst.fname('usr/bin')}")
+            do(['cp', ui, dst.fname('usr/bin')])
 
-        cmds = [['--clear-selections'],
-                ['--set-selections', dst.fname(psel)],
-                ['--purge', '-a']]
-        for cmd in cmds:
-            chroot(dst.path, ['/usr/bin/dpkg', *cmd])
+        chroot(dst.path, '/usr/bin/dpkg --clear-selections && '
+                         f'/usr/bin/dpkg --set-selections < /{psel} && '
+                         '/usr/bin/dpkg --purge -a')
 
 
 class ElbeFilesystem(Filesystem):
 
     def dump_elbeversion(self, xml):
-        f = self.open('etc/elbe_version', 'w+')
-        f.write(f"{xml.prj.text('name')} {xml.prj.text('version')}\n")
-        f.write(f'this RFS was generated by elbe {elbe_version}\n')
-        f.write(time.strftime('%c\n'))
-        f.close()
+        with self.open('etc/elbe_version', 'w+') as f:
+            f.write(f"{xml.prj.text('name')} {xml.prj.text('version')}\n"
+                    f'this RFS was generated by elbe {elbe_version}\n'
+                    f"{time.strftime('%c')}\n")
 
-        version_file = self.open('etc/updated_version', 'w')
-        version_file.write(xml.text('/project/version'))
-        version_file.close()
+        with self.open('etc/updated_version', 'w') as version_file:
+            version_file.write(xml.text('/project/version'))
 
         def opener(path, flags):
             return os.open(path, flags, mode=0o400)
@@ -192,35 +228,27 @@ class ElbeFilesystem(Filesystem):
 
     def write_licenses(self, f, pkglist, xml_fname=None):
         licence_xml = copyright_xml()
-        for pkg in pkglist:
-            copyright_file = os.path.join('/usr/share/doc', pkg, 'copyright')
+
+        # Logging has to stay in this thread, as the elbe log handlers drop
+        # records coming from other threads.
+        copyright_files = [os.path.join('/usr/share/doc', pkg, 'copyright')
+                           for pkg in pkglist]
+        lic_texts = _read_parallel(_read_licence_file, map(self.fname, copyright_files))
+
+        for pkg, copyright_file, lic_text in zip(pkglist, copyright_files, lic_texts):
             copyright_fname = self.fname(copyright_file)
-            if os.path.isfile(copyright_fname):
-                try:
-                    with io.open(copyright_fname, 'r',
-                                 encoding='utf-8', errors='replace') as lic:
-                        lic_text = lic.read()
-                except IOError as e:
-                    logging.exception('Error while processing license file %s',
-                                      copyright_fname)
-                    lic_text = u"Error while processing license file %s: '%s'" % (
-                        copyright_file, e.strerror)
-            else:
+            if lic_text is None:
                 logging.warning('License file does not exist, skipping %s',
                                 copyright_fname)
                 continue
-            # in Python2 'pkg' is a binary string whereas in Python3 it is a
-            # unicode string. So make sure that pkg ends up as a unicode string
-            # in both Python2 and Python3.
-            pkg = pkg.encode(encoding='utf-8').decode(encoding='utf-8')
+            if isinstance(lic_text, IOError):
+                logging.error('Error while processing license file %s',
+                              copyright_fname, exc_info=lic_text)
+                lic_text = u"Error while processing license file %s: '%s'" % (
+                    copyright_file, lic_text.strerror)
 
             if f is not None:
-                f.write(pkg)
-                f.write(':\n======================================'
-                        '==========================================')
-                f.write('\n')
-                f.write(lic_text)
-                f.write('\n\n')
+                f.write(f'{pkg}:\n{"=" * 80}\n{lic_text}\n\n')
 
             if xml_fname is not None:
                 licence_xml.add_copyright_file(pkg, lic_text)
@@ -229,6 +257,26 @@ class ElbeFilesystem(Filesystem):
             licence_xml.write(xml_fname)
 
 
+def _read_parallel(read, fnames):
+    # Reading lots of small files is dominated by waiting for I/O, which
+    # threads can overlap as the GIL is released in read(). Results are
+    # returned in the order of fnames.
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        yield from executor.map(read, fnames)
+
+
+def _read_licence_file(fname):
+    # Returns None for a missing file and the exception if reading failed,
+    # so that the caller can log from its own thread.
+    if not os.path.isfile(fname):
+        return None
+    try:
+        with io.open(fname, 'r', encoding='utf-8', errors='replace') as lic:
+            return lic.read()
+    except IOError as e:
+        return e
+
+
 def _file_or_directory_seem_equal(a, b):
     a = pathlib.Path(a)
     b = pathlib.Path(b)
@@ -462,14 +510,8 @@ class TargetFs(ChRootFilesystem):
                 options = ''
                 if self.xml.has('target/package/tar/options'):
                     options = self.xml.text('target/package/tar/options')
-                cmd = 'tar cfz %(dest)s/%(fname)s -C %(sdir)s %(options)s .'
-                args = dict(
-                    options=options,
-                    dest=targetdir,
-                    fname=targz_name,
-                    sdir=self.fname('')
-                )
-                do(cmd % args)
+                do(['tar', 'cfz', os.path.join(targetdir, targz_name),
+                    '-C', self.fname(''), *shlex.split(options), '.'])
                 # only append filename if creating tarball was successful
                 self.images.append(targz_name)
             except subprocess.CalledProcessError:
@@ -477,19 +519,31 @@ class TargetFs(ChRootFilesystem):
                 pass
 
         if self.xml.has('target/package/cpio'):
-            oldwd = os.getcwd()
             cpio_name = self.xml.text('target/package/cpio/name')
-            os.chdir(self.fname(''))
+            cpio_fname = os.path.join(targetdir, cpio_name)
             try:
-                do(
-                    f'find . -print | cpio -ov -H newc >'
-                    f'{os.path.join(targetdir, cpio_name)}')
+                with open(cpio_fname, 'wb') as cpio_file, async_logging_ctx() as log_fd:
+                    find = subprocess.Popen(['find', '.', '-print0'],
+                                            stdout=subprocess.PIPE, stderr=log_fd,
+                                            cwd=self.fname(''))
+                    grow_pipe(find.stdout)
+                    try:
+                        run(['cpio', '-o0v', '-H', 'newc'],
+                            stdin=find.stdout, stdout=cpio_file, stderr=ELBE_LOGGING,
+                            cwd=self.fname(''),
+                            log_cmd=f'find . -print0 | cpio -o0v -H newc >{cpio_fname}')
+                    finally:
+                        find.stdout.close()
+                        find.wait()
+                    if find.returncode:
+                        raise subprocess.CalledProcessError(find.returncode, find.args)
                 # only append filename if creating cpio was successful
                 self.images.append(cpio_name)
+            except OSError:
+                logging.exception('Creating cpio image %s failed', cpio_fname)
             except subprocess.CalledProcessError:
                 # error was logged; continue
                 pass
-            os.chdir(oldwd)
 
         if self.xml.has('target/package/squashfs'):
             oldwd = os.getcwd()
@@ -500,9 +554,8 @@ class TargetFs(ChRootFilesystem):
                 if self.xml.has('target/package/squashfs/options'):
                     options = self.xml.text('target/package/squashfs/options')
 
-                do(
-                    f"mksquashfs {self.fname('')} {targetdir}/{sfs_name} "
-                    f'-noappend -no-progress {options}')
+                do(['mksquashfs', self.fname(''), os.path.join(targetdir, sfs_name),
+                    '-noappend', '-no-progress', *shlex.split(options)])
                 # only append filename if creating mksquashfs was successful
                 self.images.append(sfs_name)
             except subprocess.CalledProcessError:
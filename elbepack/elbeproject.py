@@ -36,7 +36,7 @@ from elbepack.pbuilder import (
 from elbepack.repomanager import ProjectRepo
 from elbepack.rfs import BuildEnv
 from elbepack.rpcaptcache import get_rpcaptcache
-from elbepack.shellhelper import chroot, do
+from elbepack.shellhelper import ELBE_LOGGING, chroot, do, env_add, run
 from elbepack.templates import write_pack_template
 
 
@@ -288,31 +288,24 @@ class ElbeProject:
         except IOError:
             logging.exception('Dump elbeversion into sysroot failed')
 
-        sysrootfilelist = os.path.join(self.builddir, 'sysroot-filelist')
-
         with self.sysrootenv.rfs:
             chroot(self.sysrootpath, ['/usr/bin/symlinks', '-cr', '/usr/lib'])
             chroot(self.sysrootpath, ['/usr/bin/symlinks', '-cr', '/usr/lib64'])
 
         paths = self.get_sysroot_paths()
 
-        do(['rm', sysrootfilelist], check=False)
-        os.chdir(self.sysrootpath)
-        for p in paths:
-            do(f'find -path "{p}" >> {sysrootfilelist}')
+        filelist = list(self.sysrootenv.rfs.find_paths(paths))
+
         # include /lib if it is a symlink (buster and later)
-        if os.path.islink(self.sysrootpath + '/lib'):
-            with open(sysrootfilelist, 'a') as filelist_fd:
-                filelist_fd.write('./lib\n')
-        if os.path.islink(self.sysrootpath + '/lib64'):
-            with open(sysrootfilelist, 'a') as filelist_fd:
-                filelist_fd.write('./lib64\n')
-        if os.path.islink(self.sysrootpath + '/sbin'):
-            with open(sysrootfilelist, 'a') as filelist_fd:
-                filelist_fd.write('./sbin\n')
+        filelist += [f'./{d}' for d in ('lib', 'lib64', 'sbin')
+                     if os.path.islink(os.path.join(self.sysrootpath, d))]
 
+        # The file list is fed to tar on stdin. It is NUL-terminated, so
+        # that tar does not need to scan for and unquote newlines and any
+        # valid file name passes through.
         do(['tar', 'cfJ', os.path.join(self.builddir, 'sysroot.tar.xz'),
-            '-C', self.sysrootpath, '-T', sysrootfilelist],
+            '-C', self.sysrootpath, '--null', '-T', '-'],
+           input=b''.join(os.fsencode(path) + b'\0' for path in filelist),
            env_add=_xz_env)
 
     def build_host_sysroot(self, pkgs, hostsysrootpath):
@@ -410,11 +403,12 @@ class ElbeProject:
                             self.sdkpath)
 
         # create sdk tar and append it to setup script
-        do(['tar', 'cJf', '../sdk.txz', '.'], cwd=self.sdkpath, env_add=_xz_env)
+        with open(os.path.join(self.builddir, n), 'ab') as setup_script:
+            run(['tar', 'cJf', '-', '.'], cwd=self.sdkpath, env=env_add(_xz_env),
+                stdout=setup_script, stderr=ELBE_LOGGING,
+                log_cmd=f'tar cJf - . >> {n}')
         do(['rm', '-rf', 'sdk'], cwd=self.builddir)
-        do(f'cat sdk.txz >> {n}', cwd=self.builddir)
         do(['chmod', '+x', n], cwd=self.builddir)
-        do(['rm', 'sdk.txz'], cwd=self.builddir)
 
     def pbuild(self, p):
         self.pdebuild_init()
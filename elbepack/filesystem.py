@@ -3,8 +3,10 @@
 # SPDX-FileCopyrightText: 2014-2017 Linutronix GmbH
 
 import errno
+import fnmatch
 import gzip
 import os
+import re
 import shutil
 from glob import glob
 from string import digits
@@ -46,6 +48,62 @@ def size_to_int(size):
     return int(s) * unit
 
 
+def link_or_copy(src, dst):
+    """
+    Hardlink src to dst, or copy it if that is not possible, e.g. because
+    dst is on another filesystem. Symlinks in src are followed.
+
+    >>> open(this.fname("link_or_copy"), mode="w").close()
+    >>> link_or_copy(this.fname("link_or_copy"), this.fname("link_or_copy.dst"))
+    >>> os.path.samefile(this.fname("link_or_copy"), this.fname("link_or_copy.dst"))
+    True
+
+    An existing dst is replaced, files hardlinked to it are left alone
+
+    >>> with open(this.fname("link_or_copy.old"), mode="w") as f:
+    ...     _ = f.write("old")
+    >>> link_or_copy(this.fname("link_or_copy.old"), this.fname("link_or_copy.dst"))
+    >>> link_or_copy(this.fname("link_or_copy"), this.fname("link_or_copy.dst"))
+    >>> os.path.samefile(this.fname("link_or_copy"), this.fname("link_or_copy.dst"))
+    True
+    >>> this.read_file("link_or_copy.old")
+    'old'
+
+    >>> link_or_copy(this.fname("link_or_copy"), this.fname("link_or_copy"))
+    >>> os.path.isfile(this.fname("link_or_copy"))
+    True
+
+    dst is a copy if hardlinking fails, e.g. on shares without hardlinks
+
+    >>> from unittest import mock
+    >>> with mock.patch("os.link", side_effect=OSError(errno.EOPNOTSUPP, "")):
+    ...     link_or_copy(this.fname("link_or_copy.old"), this.fname("link_or_copy.copy"))
+    >>> os.path.samefile(this.fname("link_or_copy.old"), this.fname("link_or_copy.copy"))
+    False
+    >>> this.read_file("link_or_copy.copy")
+    'old'
+
+    >>> link_or_copy(this.fname("link_or_copy.missing"),
+    ...              this.fname("link_or_copy.copy")) # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    ...
+    FileNotFoundError: ...
+    """
+    if os.path.lexists(dst):
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            return
+        # Never write into dst, its inode may be shared with other files
+        os.unlink(dst)
+    try:
+        os.link(src, dst, follow_symlinks=True)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        # EXDEV, but also EPERM, EMLINK, EOPNOTSUPP or ENOSYS on
+        # filesystems that do not support hardlinks
+        shutil.copyfile(src, dst)
+
+
 class Filesystem:
 
     def __init__(self, path, clean=False):
@@ -411,6 +469,38 @@ class Filesystem:
                 realpath = os.path.join(dirpath, f)
                 yield '/' + fpath, realpath
 
+    def find_paths(self, patterns):
+        """
+        Like running 'find -path <pattern>' in the root of the filesystem
+        for every pattern, but walking the tree only once. As with find,
+        '*' also matches '/' and symlinked directories are not descended
+        into. A path matched by several patterns is returned once. Unlike
+        find, directories that cannot be read are skipped silently.
+
+        >>> this.mkdir_p("find_paths/usr/lib/gnu")
+        >>> this.mkdir_p("find_paths/usr/include")
+        >>> for f in ("lib/gnu/libc.so", "include/a.h", "include/b.h"):
+        ...     open(this.fname(f"find_paths/usr/{f}"), "w").close()
+        >>> this.symlink("usr/lib", "find_paths/lib")
+
+        >>> list(this.find_paths(["./find_paths/usr/*.so"]))
+        ['./find_paths/usr/lib/gnu/libc.so']
+
+        >>> list(this.find_paths(["./find_paths/lib*"]))
+        ['./find_paths/lib']
+
+        >>> sorted(this.find_paths(["./find_paths/usr/include/*", "./find_paths/*.h"]))
+        ['./find_paths/usr/include/a.h', './find_paths/usr/include/b.h']
+        """
+        match = re.compile('|'.join(fnmatch.translate(p) for p in patterns)).match
+        striplen = len(self.path.rstrip('/'))
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            reldir = '.' + dirpath[striplen:]
+            for name in dirnames + filenames:
+                path = f'{reldir}/{name}'
+                if match(path):
+                    yield path
+
     def mtime_snap(self, dirname='', exclude_dirs=None):
         if not exclude_dirs:
             exclude_dirs = []
@@ -99,7 +99,7 @@ class hdpart:
             except subprocess.CalledProcessError as e:
                 if e.returncode != 1:
                     raise
-                do('sync')
+                do(['sync'])
                 time.sleep(1)
 
 
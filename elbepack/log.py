@@ -4,6 +4,7 @@
 
 
 import collections
+import fcntl
 import functools
 import logging
 import multiprocessing
@@ -199,6 +200,16 @@ def open_logging(**targets):
     return _cleanup
 
 
+def grow_pipe(pipe, size=1024 * 1024):
+    # A larger pipe buffer means fewer wakeups between the two ends of a
+    # pipe. The kernel caps it at /proc/sys/fs/pipe-max-size, so this is
+    # best effort. F_SETPIPE_SZ is only exported since Python 3.10.
+    try:
+        fcntl.fcntl(pipe, getattr(fcntl, 'F_SETPIPE_SZ', 1031), size)
+    except OSError:
+        pass
+
+
 class AsyncLogging(threading.Thread):
 
     def __init__(self, atmost):
@@ -206,6 +217,8 @@ class AsyncLogging(threading.Thread):
         self.lines = []
         self.atmost = atmost
         self.read_fd, self.write_fd = os.pipe()
+        # Chatty commands like tar or cpio -v block less often on a larger pipe
+        grow_pipe(self.write_fd)
         calling_thread = threading.current_thread().ident
         extra = {'_thread': calling_thread}
         extra['context'] = ''
@@ -261,7 +274,7 @@ class AsyncLogging(threading.Thread):
             self.block.info('\n'.join(self.lines))
 
 
-def async_logging(atmost=4096):
+def async_logging(atmost=65536):
     t = AsyncLogging(atmost)
     t.start()
     return t
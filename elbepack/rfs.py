@@ -117,10 +117,9 @@ class BuildEnv:
 
         if os.path.exists(self.path + '/../repo/pool'):
             do(['mv', self.path + '/../repo', self.path])
-            do(f'echo "deb copy:///repo {suite} main" > '
-               f'{self.path}/etc/apt/sources.list.d/local.list')
-            do(f'echo "deb-src copy:///repo {suite} main" >> '
-               f'{self.path}/etc/apt/sources.list.d/local.list')
+            self.rfs.write_file('etc/apt/sources.list.d/local.list', None,
+                                f'deb copy:///repo {suite} main\n'
+                                f'deb-src copy:///repo {suite} main\n')
 
         self.cdrom_mount()
         self.rfs.__enter__()
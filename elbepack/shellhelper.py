@@ -124,12 +124,17 @@ def do(cmd, /, *, env_add=None, **kwargs):
     Traceback (most recent call last):
     ...
     subprocess.CalledProcessError: ...
+
+    >>> do("echo $ELBE", env_add={"ELBE": "env"})
+    [CMD] echo $ELBE
+    env
+    env
     >>> cleanup()
     """
 
-    new_env = os.environ.copy()
-    if env_add:
-        new_env.update(env_add)
+    # Without additions the child simply inherits our environment, there
+    # is no need to copy it.
+    new_env = _env_add(env_add) if env_add else None
 
     run(cmd, shell=_is_shell_cmd(cmd), env=new_env, stdout=ELBE_LOGGING, stderr=subprocess.STDOUT,
         **kwargs)
@@ -168,3 +173,7 @@ def env_add(d):
     env = os.environ.copy()
     env.update(d)
     return env
+
+
+# do() shadows env_add() with its keyword argument
+_env_add = env_add
@@ -3,6 +3,7 @@
 # SPDX-FileCopyrightText: 2014, 2017 Linutronix GmbH
 
 import os
+import shutil
 from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
 
 
@@ -22,8 +23,10 @@ def create_zip_archive(zipfilename, path, inarchpath):
                 zi = ZipInfo(archname)
                 stat = os.stat(path + '/' + archname)
                 zi.external_attr = stat.st_mode << 16
+                # the size decides whether zip64 extensions are needed
+                zi.file_size = stat.st_size
                 # this hack is needed to use the external attributes
                 # there is no way to set a zipinfo object directly to an
                 # archive
-                with open(filename, 'rb') as f:
-                    zf.writestr(zi, f.read())
+                with open(filename, 'rb') as src, zf.open(zi, 'w') as dst:
+                    shutil.copyfileobj(src, dst)